@@ -0,0 +1,407 @@
+# cycle_recorder.py
+import argparse
+import asyncio
+import contextlib
+import json
+import os
+import struct
+import time
+import zlib
+from collections import deque
+
+import numpy as np
+import pandas as pd
+
+MAGIC = b'BDSR'
+VERSION = 2
+_FRAME = struct.Struct('<I')
+
+
+def write_header(stream):
+    stream.write(MAGIC + bytes([VERSION]))
+
+
+def write_frame(stream, record):
+    """Um ciclo por frame: tamanho (uint32) + registro codificado e comprimido com zlib"""
+    payload = zlib.compress(_encode(record))
+    stream.write(_FRAME.pack(len(payload)))
+    stream.write(payload)
+    stream.flush()
+
+
+def _encode(record):
+    """Registro -> tamanho do JSON (uint32) + JSON + bytes crus dos arrays numpy.
+
+    Sem pickle: ler uma gravação não executa código e não depende da versão do numpy/pandas.
+    Cada array vira uma referência {'__ndarray__': offset, 'dtype', 'shape'} no JSON.
+    """
+    buffers = []
+    offset = 0
+
+    def default(value):
+        nonlocal offset
+        if isinstance(value, np.ndarray):
+            if value.dtype.hasobject:
+                raise TypeError(f"array de objetos não pode ser gravado (dtype {value.dtype})")
+            data = np.ascontiguousarray(value).tobytes()
+            reference = {'__ndarray__': offset, 'dtype': value.dtype.str, 'shape': list(value.shape)}
+            buffers.append(data)
+            offset += len(data)
+            return reference
+        if isinstance(value, np.generic):
+            return value.item()
+        raise TypeError(f"tipo não serializável na gravação: {type(value).__name__}")
+
+    meta = json.dumps(record, default=default).encode()
+    return _FRAME.pack(len(meta)) + meta + b''.join(buffers)
+
+
+def _decode(payload):
+    (length,) = _FRAME.unpack_from(payload)
+    meta = payload[_FRAME.size:_FRAME.size + length]
+    data = payload[_FRAME.size + length:]
+
+    def object_hook(obj):
+        if '__ndarray__' not in obj:
+            return obj
+        dtype = np.dtype(obj['dtype'])
+        count = int(np.prod(obj['shape']))
+        if count == 0:
+            return np.empty(obj['shape'], dtype=dtype)
+        array = np.frombuffer(data, dtype=dtype, count=count, offset=obj['__ndarray__'])
+        return array.reshape(obj['shape']).copy()
+
+    return json.loads(meta, object_hook=object_hook)
+
+
+def _as_recorded(value):
+    """Mesma forma que o valor teria depois de gravado e lido (tuplas viram listas etc.)"""
+    return _decode(_encode(value))
+
+
+def read_recording(path):
+    """Itera os ciclos gravados em um arquivo; um último frame truncado encerra a leitura"""
+    with open(path, 'rb') as stream:
+        header = stream.read(len(MAGIC) + 1)
+        if len(header) < len(MAGIC) + 1 or header[:len(MAGIC)] != MAGIC or header[-1] != VERSION:
+            raise ValueError(f"{path} não é uma gravação válida (versão {VERSION})")
+
+        while True:
+            size = stream.read(_FRAME.size)
+            if len(size) < _FRAME.size:
+                return
+            (length,) = _FRAME.unpack(size)
+            payload = stream.read(length)
+            if len(payload) < length:
+                # Gravação interrompida no meio do frame (ex.: Ctrl-C)
+                return
+            yield _decode(zlib.decompress(payload))
+
+
+def _snapshot_market(market):
+    """Mercado -> dict compacto (OHLCV como arrays numpy por coluna)"""
+    snapshot = {k: v for k, v in market.items() if k != 'ohlcv'}
+    snapshot['ohlcv'] = {column: market['ohlcv'][column].to_numpy() for column in market['ohlcv'].columns}
+    return snapshot
+
+
+def _restore_market(snapshot):
+    market = dict(snapshot)
+    market['ohlcv'] = pd.DataFrame(snapshot['ohlcv'])
+    return market
+
+
+class CycleRecorder:
+    """Grava entradas (mercados, relógio, preços de execução) e saídas (sinais, risco, ordens) de cada ciclo.
+
+    O relógio é gravado por ponto de chamada, não por leitura: início do ciclo, duração da
+    busca de mercados e duração de cada análise/execução por símbolo. Uma leitura de relógio
+    a mais ou a menos no código não desalinha o replay.
+    """
+
+    def __init__(self, sink):
+        self.sink = sink  # callable que recebe o registro do ciclo
+        self.current = None
+
+    def attach(self, bot):
+        """Intercepta os componentes do bot; deve ser chamado antes do primeiro ciclo"""
+        run_cycle = bot.run_cycle
+        get_filtered_markets = bot.market_filter.get_filtered_markets
+        analyze_market = bot.analyze_market
+        analyze = bot.strategy.analyze
+        can_trade = bot.risk_manager.can_trade
+        execute_trade = bot.risk_manager.execute_trade
+        evaluate = bot.portfolio_risk.evaluate
+        schedule = bot.scheduler.analyze
+        get_current_price = bot.trader.get_current_price
+        place_market_order = bot.trader.place_market_order
+
+        async def recorded_run_cycle():
+            self.current = {
+                'cycle': bot.cycle_count + 1,
+                'clock': {'start': bot.clock(), 'fetch': 0.0, 'analysis': {}, 'execution': {}},
+                'markets': [],
+                'fills': [],
+                'signals': {},
+                'decisions': [],
+                'orders': []
+            }
+            try:
+                return await run_cycle()
+            finally:
+                self.sink(self.current)
+                self.current = None
+
+        async def recorded_markets():
+            started = bot.clock()
+            markets = await get_filtered_markets()
+            if self.current is not None:
+                self.current['clock']['fetch'] = bot.clock() - started
+                self.current['markets'] = [_snapshot_market(market) for market in markets]
+            return markets
+
+        async def recorded_analyze_market(market):
+            started = bot.clock()
+            signal = await analyze_market(market)
+            if self.current is not None:
+                self.current['clock']['analysis'][market['symbol']] = bot.clock() - started
+            return signal
+
+        async def recorded_analyze(market_data):
+            signal = await analyze(market_data)
+            if self.current is not None:
+                self.current['signals'][market_data['symbol']] = _signal_key(signal)
+            return signal
+
+        async def recorded_can_trade():
+            allowed = await can_trade()
+            if self.current is not None:
+                self.current['decisions'].append(('can_trade', allowed))
+            return allowed
+
+        async def recorded_execute_trade(market, signal, trader, position_size=None):
+            started = bot.clock()
+            trade = await execute_trade(market, signal, trader, position_size)
+            if self.current is not None:
+                self.current['clock']['execution'][market['symbol']] = bot.clock() - started
+                self.current['decisions'].append(('execute', market['symbol'], trade is not None))
+            return trade
+
+        def recorded_evaluate(candidates, risk_manager, remaining_trades, exposure):
+            allocations = evaluate(candidates, risk_manager, remaining_trades, exposure)
+            if self.current is not None:
+                self.current['decisions'].append(
+                    ('allocate', [(market['symbol'], size) for market, _, size in allocations]))
+            return allocations
+
+        async def recorded_schedule(markets, analyze_market, open_symbols, clock, started):
+            analyzed, shed = await schedule(markets, analyze_market, open_symbols, clock, started)
+            if self.current is not None:
+                self.current['decisions'].append(('analyzed', [market['symbol'] for market, _ in analyzed]))
+            return analyzed, shed
+
+        async def recorded_price(symbol):
+            price = await get_current_price(symbol)
+            if self.current is not None:
+                self.current['fills'].append((symbol, float(price)))
+            return price
+
+        async def recorded_order(symbol, side, amount):
+            order = await place_market_order(symbol=symbol, side=side, amount=amount)
+            if self.current is not None and order:
+                self.current['orders'].append((order['symbol'], order['side'], order['amount'], order['price']))
+            return order
+
+        bot.run_cycle = recorded_run_cycle
+        bot.market_filter.get_filtered_markets = recorded_markets
+        bot.analyze_market = recorded_analyze_market
+        bot.strategy.analyze = recorded_analyze
+        bot.risk_manager.can_trade = recorded_can_trade
+        bot.risk_manager.execute_trade = recorded_execute_trade
+        bot.portfolio_risk.evaluate = recorded_evaluate
+        bot.scheduler.analyze = recorded_schedule
+        bot.trader.get_current_price = recorded_price
+        bot.trader.place_market_order = recorded_order
+        return bot
+
+
+def _signal_key(signal):
+    """Parte comparável de um sinal (ação e confiança)"""
+    if not isinstance(signal, dict):
+        return None
+    return signal.get('action'), float(signal.get('confidence', 0))
+
+
+class ReplayFeed:
+    """Entradas gravadas de um ciclo: relógio virtual, mercados e preços de execução.
+
+    O relógio só avança nos pontos gravados (busca de mercados, análise e execução de cada
+    símbolo); entre eles, qualquer número de leituras devolve o mesmo instante.
+    """
+
+    def __init__(self):
+        self.record = None
+        self.now = None
+        self.fills = {}
+
+    def attach(self, bot):
+        """Substitui exchange, relógio e os pontos de avanço do relógio no bot"""
+        analyze_market = bot.analyze_market
+        execute_trade = bot.risk_manager.execute_trade
+
+        async def replayed_analyze_market(market):
+            signal = await analyze_market(market)
+            self._advance('analysis', market['symbol'])
+            return signal
+
+        async def replayed_execute_trade(market, signal, trader, position_size=None):
+            trade = await execute_trade(market, signal, trader, position_size)
+            self._advance('execution', market['symbol'])
+            return trade
+
+        bot.market_filter.get_filtered_markets = self.get_filtered_markets
+        bot.trader.get_current_price = self.get_current_price
+        bot.analyze_market = replayed_analyze_market
+        bot.risk_manager.execute_trade = replayed_execute_trade
+        bot.set_clock(self.clock)
+
+    def load(self, record):
+        self.record = record
+        self.now = record['clock']['start']
+        self.fills = {}
+        for symbol, price in record['fills']:
+            self.fills.setdefault(symbol, deque()).append(price)
+
+    def clock(self):
+        return self.now if self.now is not None else time.time()
+
+    def _advance(self, stage, symbol):
+        # Símbolo que não existia na gravação nesta etapa não consome tempo
+        self.now += self.record['clock'][stage].get(symbol, 0.0)
+
+    async def get_filtered_markets(self):
+        self.now += self.record['clock']['fetch']
+        return [_restore_market(snapshot) for snapshot in self.record['markets']]
+
+    async def get_current_price(self, symbol):
+        prices = self.fills.get(symbol)
+        if prices:
+            return prices.popleft()
+        # Ordem que não existia na gravação: usa o último preço do snapshot
+        for snapshot in self.record['markets']:
+            if snapshot['symbol'] == symbol:
+                return float(snapshot['current_price'])
+        return 0.0
+
+
+class CycleReplayer:
+    """Reexecuta uma gravação no TradingBot real, o mais rápido possível, e compara as saídas"""
+
+    OUTPUTS = ('signals', 'decisions', 'orders')
+
+    def __init__(self, bot, path, quiet=True):
+        self.bot = bot
+        self.path = path
+        self.quiet = quiet
+        self.feed = ReplayFeed()
+        self.replayed = []
+
+        self.feed.attach(bot)
+        CycleRecorder(self.replayed.append).attach(bot)
+
+    async def replay(self):
+        """Retorna relatório com divergências e throughput"""
+        divergences = []
+        cycles = signals = orders = 0
+        cycle_time = 0.0
+
+        with open(os.devnull, 'w') as devnull, \
+                (contextlib.redirect_stdout(devnull) if self.quiet else contextlib.nullcontext()):
+            for recorded in read_recording(self.path):
+                self.feed.load(recorded)
+                self.bot.cycle_count = recorded['cycle'] - 1
+
+                start = time.perf_counter()
+                await self.bot.run_cycle()
+                cycle_time += time.perf_counter() - start
+
+                replayed = _as_recorded(self.replayed.pop())
+                for output in self.OUTPUTS:
+                    if replayed[output] != recorded[output]:
+                        divergences.append({
+                            'cycle': recorded['cycle'],
+                            'output': output,
+                            'recorded': recorded[output],
+                            'replayed': replayed[output]
+                        })
+
+                cycles += 1
+                signals += len(replayed['signals'])
+                orders += len(replayed['orders'])
+
+        return {
+            'cycles': cycles,
+            'signals': signals,
+            'orders': orders,
+            'seconds': cycle_time,
+            'cycles_per_second': cycles / cycle_time if cycle_time else 0.0,
+            'signals_per_second': signals / cycle_time if cycle_time else 0.0,
+            'divergences': divergences
+        }
+
+
+async def record(config, bot_cls, path, cycles):
+    """Roda o bot normalmente por N ciclos gravando cada um em `path`"""
+    bot = bot_cls(config)
+    with open(path, 'wb') as stream:
+        write_header(stream)
+        CycleRecorder(lambda cycle: write_frame(stream, cycle)).attach(bot)
+        try:
+            await bot.run(max_cycles=cycles)
+        finally:
+            bot.stop()
+    print(f"💾 {bot.cycle_count} ciclos gravados em {path}")
+
+
+async def replay(config, bot_cls, path, quiet=True):
+    bot = bot_cls(config)
+    try:
+        report = await CycleReplayer(bot, path, quiet=quiet).replay()
+    finally:
+        bot.thread_pool.shutdown()
+
+    print(f"🔁 Replay: {report['cycles']} ciclos em {report['seconds']:.3f}s "
+          f"({report['cycles_per_second']:.1f} ciclos/s, {report['signals_per_second']:.1f} sinais/s, "
+          f"{report['orders']} ordens)")
+    if report['divergences']:
+        print(f"❌ {len(report['divergences'])} divergências")
+        for divergence in report['divergences'][:10]:
+            print(f"   ciclo {divergence['cycle']} [{divergence['output']}]: "
+                  f"gravado={divergence['recorded']} replay={divergence['replayed']}")
+    else:
+        print("✅ Sem divergências")
+    return report
+
+
+def main():
+    from main import CONFIG, TradingBot
+
+    parser = argparse.ArgumentParser(description="Gravação e replay determinístico de ciclos do bot")
+    subparsers = parser.add_subparsers(dest='mode', required=True)
+    record_parser = subparsers.add_parser('record')
+    record_parser.add_argument('path')
+    record_parser.add_argument('--cycles', type=int, default=20)
+    replay_parser = subparsers.add_parser('replay')
+    replay_parser.add_argument('path')
+    replay_parser.add_argument('--verbose', action='store_true')
+    args = parser.parse_args()
+
+    if args.mode == 'record':
+        asyncio.run(record(CONFIG, TradingBot, args.path, args.cycles))
+    else:
+        report = asyncio.run(replay(CONFIG, TradingBot, args.path, quiet=not args.verbose))
+        raise SystemExit(1 if report['divergences'] else 0)
+
+
+if __name__ == "__main__":
+    main()
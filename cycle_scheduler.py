@@ -0,0 +1,96 @@
+# cycle_scheduler.py
+import numpy as np
+
+
+class CycleScheduler:
+    """Analisa os símbolos por prioridade dentro do deadline do ciclo e descarta o que não cabe"""
+
+    def __init__(self, config, scan_interval):
+        self.max_staleness = config.get('max_staleness', scan_interval)  # idade máxima dos dados ao executar
+        # Análise que termina depois de max_staleness seria descartada de qualquer forma
+        self.deadline = min(config.get('cycle_deadline', scan_interval * 0.8), self.max_staleness)
+        self.volatility_window = config.get('volatility_window', 20)
+        self.weights = {'volume': 1.0, 'position': 2.0, 'volatility': 1.0, **config.get('weights', {})}
+
+        self.cost_estimates = {}  # símbolo -> média móvel do tempo de análise
+        self.cost_alpha = 0.3
+        self.shed_total = 0
+        self.stale_total = 0
+
+    def prioritize(self, markets, open_symbols):
+        """Ordena por volume, posição aberta e volatilidade recente (features normalizadas)"""
+        if len(markets) < 2:
+            return list(markets)
+
+        volume = np.log1p([market.get('volume_24h', 0) for market in markets])
+        position = np.array([market['symbol'] in open_symbols for market in markets], dtype=float)
+        volatility = np.array([self._volatility(market) for market in markets])
+
+        score = (self.weights['volume'] * self._normalize(volume) +
+                 self.weights['position'] * position +
+                 self.weights['volatility'] * self._normalize(volatility))
+
+        return [markets[i] for i in np.argsort(-score, kind='stable')]
+
+    async def analyze(self, markets, analyze, open_symbols, clock, started):
+        """Roda `analyze` em ordem de prioridade até o deadline; retorna ([(market, signal)], descartados).
+
+        O tempo vem de `clock` (relógio do bot), então o replay reproduz os mesmos descartes.
+        A análise é CPU-bound e não pode ser interrompida: só entra quem cabe no tempo restante.
+        """
+        results = []
+        shed = 0
+
+        for market in self.prioritize(markets, open_symbols):
+            symbol = market['symbol']
+            remaining = self.deadline - (clock() - started)
+            estimate = self.cost_estimates.get(symbol, self._default_estimate())
+
+            if remaining <= 0 or estimate > remaining:
+                # Decai a estimativa para o símbolo não ficar de fora para sempre
+                if symbol in self.cost_estimates:
+                    self.cost_estimates[symbol] *= 0.5
+                shed += 1
+                continue
+
+            analysis_start = clock()
+            try:
+                signal = await analyze(market)
+            except Exception as e:
+                print(f"   ❌ Erro análise {symbol}: {e}")
+                continue
+
+            self._update_estimate(symbol, clock() - analysis_start)
+            results.append((market, signal))
+
+        self.shed_total += shed
+        return results, shed
+
+    def is_stale(self, market, now):
+        """Dados mais velhos que max_staleness não geram ordens"""
+        fetched_at = market.get('fetched_at')
+        return fetched_at is not None and now - fetched_at > self.max_staleness
+
+    def _volatility(self, market):
+        ohlcv = market.get('ohlcv')
+        if ohlcv is None or len(ohlcv) < 3:
+            return 0.0
+        closes = ohlcv['close'].to_numpy(dtype=float)[-self.volatility_window:]
+        return float(np.std(np.diff(np.log(closes))))
+
+    def _normalize(self, values):
+        peak = np.max(values)
+        return values / peak if peak > 0 else np.zeros_like(values)
+
+    def _default_estimate(self):
+        """Símbolo sem histórico: assume o custo médio dos demais"""
+        if not self.cost_estimates:
+            return 0.0
+        return sum(self.cost_estimates.values()) / len(self.cost_estimates)
+
+    def _update_estimate(self, symbol, elapsed):
+        previous = self.cost_estimates.get(symbol)
+        if previous is None:
+            self.cost_estimates[symbol] = elapsed
+        else:
+            self.cost_estimates[symbol] = (1 - self.cost_alpha) * previous + self.cost_alpha * elapsed
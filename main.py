@@ -5,8 +5,11 @@ import time
 from concurrent.futures import ThreadPoolExecutor
 from exchange_trader import Trader
 from risk_manager import RiskManager
+from portfolio_risk import PortfolioRiskEvaluator
+from cycle_scheduler import CycleScheduler
 from trading_strategy import TradingStrategy
 from market_analyzer import MarketFilter
+from shard_coordinator import run_sharded
 from logger import setup_logging
 
 
@@ -16,76 +19,35 @@ class TradingBot:
         self.running = False
         self.trader = Trader(config['exchange'])
         self.risk_manager = RiskManager(config['risk_management'])
+        self.portfolio_risk = PortfolioRiskEvaluator(config['risk_management'])
+        self.scheduler = CycleScheduler(config.get('scheduler', {}), config['scan_interval'])
         self.strategy = TradingStrategy(config['strategy'])
         self.market_filter = MarketFilter(config['filters'])
         self.thread_pool = ThreadPoolExecutor(max_workers=10)
         setup_logging()
         self.logger = logging.getLogger(__name__)
+        self.cycle_count = 0
+        self.clock = time.time
 
         # Cache para evitar reanálises desnecessárias
         self.last_analysis = {}
         self.analysis_cache_ttl = 3  # segundos
 
-    async def run(self):
+    async def run(self, max_cycles=None):
         """Execução principal otimizada"""
         self.running = True
         print("🚀 Bot de Trading RÁPIDO iniciado")
         print("⚡ Modo: Análise paralela e entradas aceleradas")
 
-        cycle_count = 0
-
         try:
-            while self.running:
-                cycle_count += 1
+            while self.running and (max_cycles is None or self.cycle_count < max_cycles):
                 start_time = time.time()
 
-                print(f"\n🎯 Ciclo {cycle_count} - Buscando oportunidades...")
-
-                # 1. Busca mercados em paralelo
-                markets = await self.market_filter.get_filtered_markets()
-                if not markets:
-                    print("   ⚠️ Nenhum mercado passou nos filtros")
+                trade_count = await self.run_cycle()
+                if trade_count is None:
                     await asyncio.sleep(1)
                     continue
 
-                print(f"   📊 {len(markets)} mercados para análise")
-
-                # 2. Analisa mercados em paralelo
-                analysis_tasks = []
-                for market in markets:
-                    # Verifica cache para evitar reanálise
-                    cache_key = f"{market['symbol']}_{int(time.time() // self.analysis_cache_ttl)}"
-                    if cache_key not in self.last_analysis:
-                        task = asyncio.create_task(self.analyze_market(market))
-                        analysis_tasks.append((market['symbol'], task))
-                    else:
-                        print(f"   ♻️ {market['symbol']} usando cache")
-
-                # Aguarda todas as análises paralelas
-                signals = []
-                for symbol, task in analysis_tasks:
-                    try:
-                        signal = await task
-                        signals.append(signal)
-                    except Exception as e:
-                        print(f"   ❌ Erro análise {symbol}: {e}")
-                        signals.append({'action': 'hold', 'confidence': 0})
-
-                # 3. Executa trades para sinais válidos
-                trade_count = 0
-                for i, signal in enumerate(signals):
-                    if (isinstance(signal, dict) and
-                            signal.get('action') != 'hold' and
-                            signal.get('confidence', 0) >= self.config['strategy']['min_confidence']):
-
-                        market = markets[i]
-                        print(
-                            f"   🎯 SINAL FORTE: {market['symbol']} {signal['action']} (conf: {signal['confidence']:.2f})")
-
-                        trade_result = await self.execute_trade_if_approved(market, signal)
-                        if trade_result:
-                            trade_count += 1
-
                 # 4. Timing otimizado
                 processing_time = time.time() - start_time
                 sleep_time = max(0.1, self.config['scan_interval'] - processing_time)
@@ -99,11 +61,78 @@ class TradingBot:
             print(f"❌ Erro no bot: {e}")
             self.logger.error(f"Erro no bot: {e}")
 
+    async def run_cycle(self):
+        """Um ciclo completo (mercados -> sinais -> risco -> ordens); retorna nº de trades"""
+        self.cycle_count += 1
+        cycle_start = self.clock()
+        print(f"\n🎯 Ciclo {self.cycle_count} - Buscando oportunidades...")
+
+        # 1. Busca mercados em paralelo
+        markets = await self.market_filter.get_filtered_markets()
+        if not markets:
+            print("   ⚠️ Nenhum mercado passou nos filtros")
+            return None
+
+        fetched_at = self.clock()
+        for market in markets:
+            market.setdefault('fetched_at', fetched_at)
+
+        print(f"   📊 {len(markets)} mercados para análise")
+
+        # 2. Analisa mercados por prioridade dentro do deadline do ciclo
+        pending = []
+        for market in markets:
+            # Verifica cache para evitar reanálise
+            cache_key = f"{market['symbol']}_{int(self.clock() // self.analysis_cache_ttl)}"
+            if cache_key not in self.last_analysis:
+                pending.append(market)
+            else:
+                print(f"   ♻️ {market['symbol']} usando cache")
+
+        open_symbols = {position['trade']['symbol'] for position in self.risk_manager.active_positions()}
+        analyzed, shed = await self.scheduler.analyze(pending, self.analyze_market, open_symbols,
+                                                      self.clock, cycle_start)
+        if shed:
+            print(f"   ✂️ {shed} símbolos descartados pelo deadline ({self.scheduler.deadline:.1f}s)")
+
+        candidates = []
+        for market, signal in analyzed:
+            if (isinstance(signal, dict) and
+                    signal.get('action') != 'hold' and
+                    signal.get('confidence', 0) >= self.config['strategy']['min_confidence']):
+                candidates.append((market, signal))
+
+        # 3. Avaliação de risco em lote: melhores sinais primeiro, orçamento dividido de uma vez
+        trade_count = 0
+        remaining_trades, exposure = 0, {}
+        if candidates:
+            remaining_trades = await self.risk_manager.remaining_trades()
+            exposure = await self.risk_manager.portfolio_exposure()
+        allocations = self.portfolio_risk.evaluate(candidates, self.risk_manager, remaining_trades, exposure)
+        if len(allocations) < len(candidates):
+            print(f"   📉 {len(candidates) - len(allocations)} sinais descartados pelo risco do portfólio")
+
+        for market, signal, position_size in allocations:
+            if self.scheduler.is_stale(market, self.clock()):
+                self.scheduler.stale_total += 1
+                print(f"   🕰️ Sinal de {market['symbol']} ignorado: dados mais velhos que "
+                      f"{self.scheduler.max_staleness:.1f}s")
+                continue
+
+            print(
+                f"   🎯 SINAL FORTE: {market['symbol']} {signal['action']} (conf: {signal['confidence']:.2f})")
+
+            trade_result = await self.execute_trade_if_approved(market, signal, position_size)
+            if trade_result:
+                trade_count += 1
+
+        return trade_count
+
     async def analyze_market(self, market):
         """Analisa um mercado individualmente"""
         try:
             # Cache para evitar análise repetida
-            cache_key = f"{market['symbol']}_{int(time.time() // self.analysis_cache_ttl)}"
+            cache_key = f"{market['symbol']}_{int(self.clock() // self.analysis_cache_ttl)}"
 
             if cache_key in self.last_analysis:
                 return self.last_analysis[cache_key]
@@ -112,7 +141,7 @@ class TradingBot:
             self.last_analysis[cache_key] = signal
 
             # Limpa cache antigo
-            current_time_key = int(time.time() // self.analysis_cache_ttl)
+            current_time_key = int(self.clock() // self.analysis_cache_ttl)
             self.last_analysis = {k: v for k, v in self.last_analysis.items()
                                   if int(k.split('_')[-1]) >= current_time_key - 1}
 
@@ -122,10 +151,10 @@ class TradingBot:
             print(f"❌ Erro analisando {market['symbol']}: {e}")
             return {'action': 'hold', 'confidence': 0}
 
-    async def execute_trade_if_approved(self, market, signal):
+    async def execute_trade_if_approved(self, market, signal, position_size=None):
         """Executa trade se aprovado pelo risk manager"""
         if await self.risk_manager.can_trade():
-            trade_result = await self.risk_manager.execute_trade(market, signal, self.trader)
+            trade_result = await self.risk_manager.execute_trade(market, signal, self.trader, position_size)
             if trade_result:
                 print(f"   ✅ TRADE EXECUTADO: {market['symbol']} {signal['action']}")
                 return trade_result
@@ -133,6 +162,11 @@ class TradingBot:
             print(f"   ⚠️ Trade bloqueado pelo gerenciamento de risco")
         return None
 
+    def set_clock(self, clock):
+        """Troca o relógio do bot e do risk manager (ex.: relógio falso no replay)"""
+        self.clock = clock
+        self.risk_manager.clock = clock
+
     def stop(self):
         """Para o bot"""
         self.running = False
@@ -153,7 +187,10 @@ CONFIG = {
         'max_position_size': 500,
         'daily_loss_limit': -300,
         'risk_per_trade': 0.01,
-        'quick_mode': True
+        'quick_mode': True,
+        'correlation_window': 30,  # candles para a matriz de correlação
+        'max_correlation': 0.8,  # acima disso, só o melhor sinal do grupo correlacionado entra
+        'max_cycle_exposure': 1500  # soma dos tamanhos alocados em um ciclo (avaliação em lote)
     },
     'strategy': {
         'rsi_period': 9,
@@ -170,7 +207,17 @@ CONFIG = {
         'allowed_pairs': ['BTC/USDT', 'ETH/USDT', 'ADA/USDT', 'BNB/USDT', 'SOL/USDT'],
         'exclude_stablecoins': True
     },
-    'scan_interval': 3
+    'scan_interval': 3,
+    'scheduler': {
+        'cycle_deadline': 2.0,  # análise que não cabe no ciclo é descartada (limitado a max_staleness)
+        'max_staleness': 2.5,  # nunca executa sinal com dados mais velhos que isso (s)
+        'weights': {'volume': 1.0, 'position': 2.0, 'volatility': 1.0}
+    },
+    'sharding': {
+        'enabled': False,  # N processos worker + coordenador de risco global
+        'workers': 2,
+        'socket_path': '/tmp/botdeepseek_coordinator.sock'
+    }
 }
 
 
@@ -192,4 +239,7 @@ async def main():
 
 
 if __name__ == "__main__":
-    asyncio.run(main())
\ No newline at end of file
+    if CONFIG['sharding']['enabled']:
+        run_sharded(CONFIG, TradingBot)
+    else:
+        asyncio.run(main())
\ No newline at end of file
@@ -0,0 +1,101 @@
+# portfolio_risk.py
+import numpy as np
+
+
+class PortfolioRiskEvaluator:
+    """Avaliação de risco em lote: ranqueia todos os sinais do ciclo e distribui o orçamento"""
+
+    def __init__(self, config):
+        self.config = config
+        self.correlation_window = config.get('correlation_window', 30)
+        self.max_correlation = config.get('max_correlation', 0.8)
+        self.max_cycle_exposure = config.get('max_cycle_exposure', float('inf'))
+
+    def evaluate(self, candidates, risk_manager, remaining_trades, exposure):
+        """Recebe [(market, signal)], as vagas do dia e a exposição líquida por ativo
+        (RiskManager.remaining_trades / portfolio_exposure) e retorna
+        [(market, signal, position_size)] na ordem de execução.
+
+        A correlação usa só os candidatos recebidos: no modo shard, cada worker
+        correlaciona apenas os seus símbolos (a exposição, essa sim, é global).
+        """
+        if not candidates or remaining_trades <= 0:
+            return []
+
+        markets = [market for market, _ in candidates]
+        signals = [signal for _, signal in candidates]
+
+        confidence = np.array([signal['confidence'] for signal in signals], dtype=float)
+        direction = np.array([1.0 if signal['action'] == 'buy' else -1.0 for signal in signals])
+
+        # 1. Exposição atual por ativo (na direção do sinal)
+        asset_exposure = np.array([exposure.get(market['symbol'].split('/')[0], 0) for market in markets],
+                                  dtype=float)
+        same_side = np.maximum(asset_exposure * direction, 0)
+        exposure_weight = 1.0 / (1.0 + same_side / self.config['max_position_size'])
+
+        # 2. Ranking por confiança, penalizado pela exposição já aberta no ativo
+        score = confidence * exposure_weight
+        order = np.argsort(-score, kind='stable')
+
+        # 3. Pares em cooldown não disputam orçamento
+        cooling = self._cooldown_mask(markets, risk_manager)[order]
+
+        # 4. Correlação direcional (compra+compra soma risco, compra+venda em ativos
+        #    correlacionados é hedge) só contra candidatos já aceitos, até esgotar as vagas
+        correlation = self._correlation_matrix(markets)
+        directional = correlation * np.outer(direction, direction)
+        ranked = directional[np.ix_(order, order)]
+
+        eligible = np.zeros(len(order), dtype=bool)
+        accepted = 0
+        for k in range(len(order)):
+            if accepted >= remaining_trades:
+                break
+            if cooling[k] or (accepted and ranked[eligible, k].max() > self.max_correlation):
+                continue
+            eligible[k] = True
+            accepted += 1
+
+        # 5. Orçamento de posição do ciclo, alocado na ordem do ranking
+        size = self._position_sizes(confidence)[order] * exposure_weight[order] * eligible
+        allocated_before = np.concatenate(([0.0], np.cumsum(size)[:-1]))
+        size = np.minimum(size, np.maximum(self.max_cycle_exposure - allocated_before, 0))
+
+        return [(markets[i], signals[i], float(size[k]))
+                for k, i in enumerate(order) if size[k] > 0]
+
+    def _correlation_matrix(self, markets):
+        """Correlação dos retornos log recentes, alinhados pela janela comum"""
+        n = len(markets)
+        if n < 2:
+            return np.eye(n)
+
+        window = min(self.correlation_window, min(len(market['ohlcv']) for market in markets))
+        if window < 3:
+            return np.eye(n)
+
+        closes = np.vstack([market['ohlcv']['close'].to_numpy(dtype=float)[-window:] for market in markets])
+        returns = np.diff(np.log(closes), axis=1)
+
+        with np.errstate(invalid='ignore', divide='ignore'):
+            correlation = np.corrcoef(returns)
+
+        # Séries constantes geram NaN: tratadas como não correlacionadas
+        correlation = np.nan_to_num(correlation, nan=0.0)
+        np.fill_diagonal(correlation, 1.0)
+        return correlation
+
+    def _cooldown_mask(self, markets, risk_manager):
+        now = risk_manager.now()
+        return np.array([
+            market['symbol'] in risk_manager.last_trade_time and
+            (now - risk_manager.last_trade_time[market['symbol']]).total_seconds() < risk_manager.cooldown_period
+            for market in markets
+        ], dtype=bool)
+
+    def _position_sizes(self, confidence):
+        """Mesma regra de RiskManager._quick_position_size, vetorizada"""
+        base_size = self.config['max_position_size'] * 0.08
+        size = np.where(confidence > 0.7, base_size * 1.3, base_size)
+        return np.minimum(size, self.config['max_position_size'])
@@ -1,14 +1,26 @@
 # risk_manager.py
+import time
 import pandas as pd
 from datetime import datetime, timedelta
 
 
+def net_exposure(trades):
+    """Soma assinada (compra +, venda -) dos tamanhos por ativo base"""
+    net = {}
+    for trade in trades:
+        asset = trade['symbol'].split('/')[0]
+        sign = 1 if trade['side'] == 'buy' else -1
+        net[asset] = net.get(asset, 0) + sign * trade['amount']
+    return net
+
+
 class RiskManager:
     def __init__(self, config):
         self.config = config
+        self.clock = time.time
         self.daily_trades = 0
         self.daily_pnl = 0
-        self.last_reset = datetime.now()
+        self.last_reset = self.now()
         self.open_positions = []
         self.quick_mode = config.get('quick_mode', False)
         self.last_trade_time = {}
@@ -25,20 +37,32 @@ class RiskManager:
 
         return True
 
-    async def execute_trade(self, market, signal, trader):
+    async def remaining_trades(self):
+        """Vagas restantes no orçamento diário de trades"""
+        self._reset_daily_counters()
+        return max(0, self.config['max_daily_trades'] - self.daily_trades)
+
+    def active_positions(self):
+        """Posições do dia: o bot ainda não fecha posições, então as de dias anteriores não contam"""
+        today = self.now().date()
+        return [position for position in self.open_positions if position['timestamp'].date() == today]
+
+    async def portfolio_exposure(self):
+        """Exposição líquida (compras - vendas) por ativo base"""
+        return net_exposure(position['trade'] for position in self.active_positions())
+
+    async def execute_trade(self, market, signal, trader, position_size=None):
         """Execução com cooldown para evitar trades repetitivos"""
         try:
             symbol = market['symbol']
 
             # Verifica cooldown
-            if symbol in self.last_trade_time:
-                time_since_last = (datetime.now() - self.last_trade_time[symbol]).total_seconds()
-                if time_since_last < self.cooldown_period:
-                    print(f"⏳ Cooldown ativo para {symbol}: {self.cooldown_period - time_since_last:.0f}s restantes")
-                    return None
+            if self._in_cooldown(symbol):
+                return None
 
-            # Cálculos rápidos
-            position_size = self._quick_position_size(market, signal)
+            # Cálculos rápidos (ou tamanho já alocado pela avaliação em lote)
+            if position_size is None:
+                position_size = self._quick_position_size(market, signal)
 
             if position_size <= 0:
                 return None
@@ -52,7 +76,7 @@ class RiskManager:
 
             if trade:
                 self.daily_trades += 1
-                self.last_trade_time[symbol] = datetime.now()
+                self.last_trade_time[symbol] = self.now()
                 self._set_quick_stops(market, signal, trade)
 
             return trade
@@ -61,6 +85,19 @@ class RiskManager:
             print(f"❌ Erro execução rápida: {e}")
             return None
 
+    def now(self):
+        """Data/hora atual segundo o relógio do bot"""
+        return datetime.fromtimestamp(self.clock())
+
+    def _in_cooldown(self, symbol):
+        """Verifica se o par ainda está em cooldown"""
+        if symbol in self.last_trade_time:
+            time_since_last = (self.now() - self.last_trade_time[symbol]).total_seconds()
+            if time_since_last < self.cooldown_period:
+                print(f"⏳ Cooldown ativo para {symbol}: {self.cooldown_period - time_since_last:.0f}s restantes")
+                return True
+        return False
+
     def _quick_position_size(self, market, signal):
         """Cálculo rápido de tamanho de posição"""
         base_size = self.config['max_position_size'] * 0.08  # 8% do máximo
@@ -86,12 +123,12 @@ class RiskManager:
             'trade': trade,
             'stop_loss': stop_price,
             'take_profit': take_profit,
-            'timestamp': datetime.now()
+            'timestamp': self.now()
         })
 
     def _reset_daily_counters(self):
         """Reset dos contadores diários"""
-        now = datetime.now()
+        now = self.now()
         if now.date() > self.last_reset.date():
             self.daily_trades = 0
             self.daily_pnl = 0
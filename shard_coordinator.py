@@ -0,0 +1,430 @@
+# shard_coordinator.py
+import asyncio
+import itertools
+import json
+import multiprocessing
+import os
+import time
+from datetime import datetime
+
+from risk_manager import RiskManager
+from market_analyzer import MarketFilter
+
+
+class RiskCoordinator:
+    """Coordenador central: limites globais de risco e distribuição de símbolos entre workers"""
+
+    def __init__(self, risk_config, symbols, socket_path):
+        self.config = risk_config
+        self.symbols = list(symbols)
+        self.socket_path = socket_path
+
+        self.daily_trades = 0
+        # Só recebe PnL via 'close'; o bot ainda não fecha posições, então até lá o
+        # daily_loss_limit não é aplicado na prática (o mesmo vale para o RiskManager)
+        self.daily_pnl = 0
+        self.clock = time.time
+        self.last_reset = datetime.fromtimestamp(self.clock())
+        self.cooldown_period = 30  # segundos entre trades no mesmo par (igual ao RiskManager)
+
+        self.reservations = {}  # id -> reserva pendente (vive até commit ou saída do worker)
+        # Ativo base -> exposição líquida (compras - vendas) de todos os workers. Sem saída de
+        # posições no bot, é aproximada pelas execuções do dia e zera junto com os contadores
+        self.exposure = {}
+        self.last_fill = {}  # símbolo -> horário da última execução (sobrevive ao rebalanceamento)
+        self.workers = {}  # worker_id -> símbolos atribuídos
+        self.epoch = 0
+        self._reservation_ids = itertools.count(1)
+        self.server = None
+
+    async def serve(self):
+        """Escuta conexões dos workers no socket Unix"""
+        if os.path.exists(self.socket_path):
+            os.unlink(self.socket_path)
+
+        self.server = await asyncio.start_unix_server(self._handle_connection, path=self.socket_path)
+        print(f"🧭 Coordenador ativo em {self.socket_path} ({len(self.symbols)} símbolos)")
+
+        async with self.server:
+            await self.server.serve_forever()
+
+    async def _handle_connection(self, reader, writer):
+        """Uma conexão por worker; a desconexão libera o worker e suas reservas"""
+        worker_id = None
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+
+                request = json.loads(line)
+                if request.get('op') == 'register':
+                    worker_id = request['worker_id']
+
+                # handle() é síncrono: cada requisição é aplicada atomicamente no event loop
+                response = self.handle(request, worker_id)
+                writer.write((json.dumps(response) + '\n').encode())
+                await writer.drain()
+
+        except (ConnectionError, json.JSONDecodeError, KeyError) as e:
+            print(f"❌ Erro conexão worker {worker_id}: {e}")
+        except asyncio.CancelledError:
+            pass  # coordenador encerrando
+        finally:
+            if worker_id is not None:
+                self._remove_worker(worker_id)
+            writer.close()
+
+    def handle(self, request, worker_id):
+        """Processa uma requisição do protocolo de reservas"""
+        self._reset_daily_counters()
+
+        op = request.get('op')
+        if op == 'register':
+            self._add_worker(worker_id)
+            return self._assignment(worker_id)
+        if worker_id not in self.workers:
+            return {'ok': False, 'reason': 'worker não registrado'}
+
+        if op == 'assignment':
+            return self._assignment(worker_id)
+        if op == 'status':
+            return {'ok': True, 'can_trade': self._can_trade(), 'remaining_trades': self._remaining_trades(),
+                    'exposure': self.exposure}
+        if op == 'reserve':
+            return self._reserve(worker_id, request['symbol'], float(request['amount']),
+                                 request.get('side', 'buy'))
+        if op == 'commit':
+            return self._commit(request['reservation_id'], request.get('filled', False),
+                                request.get('symbol'), float(request.get('amount', 0)), request.get('side', 'buy'))
+        if op == 'close':
+            return self._close(request['symbol'], float(request['amount']), request.get('side', 'buy'),
+                               float(request.get('pnl', 0)))
+
+        return {'ok': False, 'reason': f'operação desconhecida: {op}'}
+
+    def _remaining_trades(self):
+        """Vagas do dia, descontando reservas ainda não confirmadas"""
+        return max(0, self.config['max_daily_trades'] - self.daily_trades - len(self.reservations))
+
+    def _can_trade(self):
+        """Limites globais, contando reservas ainda não confirmadas"""
+        if self._remaining_trades() <= 0:
+            return False
+        if self.daily_pnl <= self.config['daily_loss_limit']:
+            return False
+        return True
+
+    def _reserve(self, worker_id, symbol, amount, side='buy'):
+        """Reserva atômica de um trade: orçamento diário, cooldown e tamanho de posição por símbolo"""
+        if symbol not in self.workers[worker_id]:
+            return {'granted': False, 'reason': f'{symbol} não pertence a {worker_id}'}
+        if not self._can_trade():
+            return {'granted': False, 'reason': 'limite global atingido'}
+        if symbol in self.last_fill and self.clock() - self.last_fill[symbol] < self.cooldown_period:
+            return {'granted': False, 'reason': f'cooldown ativo para {symbol}'}
+
+        # max_position_size vale por ordem, como no RiskManager: ordens em voo no mesmo
+        # símbolo (ex.: durante um rebalanceamento) somadas não passam do limite
+        in_flight = sum(r['amount'] for r in self.reservations.values() if r['symbol'] == symbol)
+        available = self.config['max_position_size'] - in_flight
+        amount = min(amount, available)
+        if amount <= 0:
+            return {'granted': False, 'reason': f'posição máxima em {symbol} reservada'}
+
+        reservation_id = next(self._reservation_ids)
+        self.reservations[reservation_id] = {
+            'worker_id': worker_id,
+            'symbol': symbol,
+            'amount': amount,
+            'side': side
+        }
+        return {'granted': True, 'id': reservation_id, 'amount': amount}
+
+    def _commit(self, reservation_id, filled, symbol=None, amount=0, side='buy'):
+        """Confirma (ordem executada) ou libera uma reserva"""
+        reservation = self.reservations.pop(reservation_id, None)
+        if reservation is not None:
+            symbol, amount, side = reservation['symbol'], reservation['amount'], reservation['side']
+
+        # Ordem executada sempre conta, mesmo sem reserva conhecida
+        if filled:
+            self._record_fill(symbol, amount, side)
+        if reservation is None:
+            return {'ok': False, 'reason': 'reserva inexistente', 'daily_trades': self.daily_trades}
+        return {'ok': True, 'daily_trades': self.daily_trades}
+
+    def _record_fill(self, symbol, amount, side):
+        self.daily_trades += 1
+        if symbol is not None:
+            self._add_exposure(symbol, amount if side == 'buy' else -amount)
+            self.last_fill[symbol] = self.clock()
+
+    def _add_exposure(self, symbol, delta):
+        asset = symbol.split('/')[0]
+        self.exposure[asset] = self.exposure.get(asset, 0) + delta
+
+    def _close(self, symbol, amount, side, pnl):
+        """Posição fechada: libera exposição e acumula PnL realizado"""
+        self._add_exposure(symbol, -amount if side == 'buy' else amount)
+        self.daily_pnl += pnl
+        return {'ok': True, 'daily_pnl': self.daily_pnl}
+
+    def _add_worker(self, worker_id):
+        self.workers[worker_id] = set()
+        self._rebalance()
+        print(f"   ➕ Worker {worker_id} entrou ({len(self.workers)} ativos)")
+
+    def _remove_worker(self, worker_id):
+        if self.workers.pop(worker_id, None) is None:
+            return
+
+        # A ordem pode ter saído antes da queda: reservas pendentes contam como executadas
+        for rid, reservation in list(self.reservations.items()):
+            if reservation['worker_id'] == worker_id:
+                del self.reservations[rid]
+                self._record_fill(reservation['symbol'], reservation['amount'], reservation['side'])
+        self._rebalance()
+        print(f"   ➖ Worker {worker_id} saiu ({len(self.workers)} ativos)")
+
+    def _rebalance(self):
+        """Distribui os símbolos em round-robin entre os workers ativos"""
+        self.epoch += 1
+        worker_ids = sorted(self.workers)
+        for worker_id in worker_ids:
+            self.workers[worker_id] = set()
+        for i, symbol in enumerate(self.symbols):
+            if worker_ids:
+                self.workers[worker_ids[i % len(worker_ids)]].add(symbol)
+
+    def _assignment(self, worker_id):
+        return {'ok': True, 'epoch': self.epoch, 'symbols': sorted(self.workers[worker_id])}
+
+    def _reset_daily_counters(self):
+        """Reset dos contadores diários"""
+        now = datetime.fromtimestamp(self.clock())
+        if now.date() > self.last_reset.date():
+            self.daily_trades = 0
+            self.daily_pnl = 0
+            self.exposure = {}
+            self.last_reset = now
+
+
+class CoordinatorClient:
+    """Cliente do coordenador usado pelos workers (uma requisição por vez)"""
+
+    def __init__(self, socket_path, worker_id):
+        self.socket_path = socket_path
+        self.worker_id = worker_id
+        self.reader = None
+        self.writer = None
+        self._lock = asyncio.Lock()
+
+    async def connect(self, timeout=10):
+        """Conecta e registra o worker, aguardando o coordenador subir"""
+        deadline = time.monotonic() + timeout
+        while True:
+            try:
+                self.reader, self.writer = await asyncio.open_unix_connection(self.socket_path)
+                break
+            except (FileNotFoundError, ConnectionRefusedError):
+                if time.monotonic() > deadline:
+                    raise
+                await asyncio.sleep(0.1)
+
+        return await self.request('register', worker_id=self.worker_id)
+
+    async def request(self, op, **payload):
+        async with self._lock:
+            self.writer.write((json.dumps({'op': op, **payload}) + '\n').encode())
+            await self.writer.drain()
+            line = await self.reader.readline()
+            if not line:
+                raise ConnectionError("Coordenador desconectado")
+            return json.loads(line)
+
+    async def close(self):
+        if self.writer:
+            self.writer.close()
+            await self.writer.wait_closed()
+
+
+class CoordinatedRiskManager(RiskManager):
+    """RiskManager de worker: limites globais via reservas no coordenador"""
+
+    def __init__(self, config, client):
+        super().__init__(config)
+        self.client = client
+
+    async def can_trade(self):
+        """Consulta os limites globais do portfólio"""
+        try:
+            status = await self.client.request('status')
+            return status.get('can_trade', False)
+        except Exception as e:
+            print(f"❌ Erro consultando coordenador: {e}")
+            return False
+
+    async def remaining_trades(self):
+        """Vagas restantes no orçamento global (não só as deste worker)"""
+        try:
+            status = await self.client.request('status')
+            return status.get('remaining_trades', 0)
+        except Exception as e:
+            print(f"❌ Erro consultando coordenador: {e}")
+            return 0
+
+    async def portfolio_exposure(self):
+        """Exposição líquida do portfólio inteiro (todos os workers), por ativo base"""
+        try:
+            status = await self.client.request('status')
+            return status.get('exposure', {})
+        except Exception as e:
+            print(f"❌ Erro consultando coordenador: {e}")
+            return await super().portfolio_exposure()
+
+    async def execute_trade(self, market, signal, trader, position_size=None):
+        """Reserva no coordenador antes de enviar a ordem e confirma depois"""
+        try:
+            symbol = market['symbol']
+
+            if self._in_cooldown(symbol):
+                return None
+
+            if position_size is None:
+                position_size = self._quick_position_size(market, signal)
+            if position_size <= 0:
+                return None
+
+            reservation = await self.client.request('reserve', symbol=symbol, amount=position_size,
+                                                    side=signal['action'])
+            if not reservation.get('granted'):
+                print(f"   🔒 Reserva negada para {symbol}: {reservation.get('reason')}")
+                return None
+
+            trade = None
+            try:
+                trade = await trader.place_market_order(
+                    symbol=symbol,
+                    side=signal['action'],
+                    amount=reservation['amount']
+                )
+            finally:
+                # Falha no commit não pode apagar a contabilidade local de uma ordem executada
+                try:
+                    await self.client.request('commit', reservation_id=reservation['id'], filled=bool(trade),
+                                              symbol=symbol, amount=reservation['amount'],
+                                              side=signal['action'])
+                except Exception as e:
+                    print(f"❌ Erro confirmando reserva {reservation['id']} ({symbol}): {e}")
+
+            if trade:
+                self.daily_trades += 1
+                self.last_trade_time[symbol] = self.now()
+                self._set_quick_stops(market, signal, trade)
+
+            return trade
+
+        except Exception as e:
+            print(f"❌ Erro execução coordenada: {e}")
+            return None
+
+    async def close_position(self, position, exit_price):
+        """Fecha uma posição: libera a exposição global e repassa o PnL realizado.
+
+        Ainda não há chamador: o bot não monitora stops nem fecha posições, então
+        o daily_loss_limit global só passa a valer quando existir essa saída.
+        """
+        trade = position['trade']
+        sign = 1 if trade['side'] == 'buy' else -1
+        pnl = sign * (exit_price - trade['price']) * trade['amount']
+
+        self.open_positions.remove(position)
+        self.daily_pnl += pnl
+        await self.client.request('close', symbol=trade['symbol'], amount=trade['amount'],
+                                  side=trade['side'], pnl=pnl)
+        return pnl
+
+
+class ShardedMarketFilter(MarketFilter):
+    """MarketFilter que só entrega os símbolos atribuídos a este worker"""
+
+    def __init__(self, config, client):
+        super().__init__(config)
+        self.client = client
+        self.assigned = set()
+        self.epoch = None
+
+    async def get_filtered_markets(self):
+        """Atualiza a atribuição antes de gerar os mercados do ciclo"""
+        assignment = await self.client.request('assignment')
+        if assignment.get('epoch') != self.epoch:
+            self.epoch = assignment.get('epoch')
+            print(f"   🔀 {self.client.worker_id}: símbolos {assignment.get('symbols', [])}")
+        self.assigned = set(assignment.get('symbols', []))
+
+        return await super().get_filtered_markets()
+
+    def _passes_filters(self, market):
+        if market['symbol'] not in self.assigned:
+            return False
+        return super()._passes_filters(market)
+
+
+def _run_coordinator(config):
+    coordinator = RiskCoordinator(
+        config['risk_management'],
+        config['filters']['allowed_pairs'],
+        config['sharding']['socket_path']
+    )
+    try:
+        asyncio.run(coordinator.serve())
+    except KeyboardInterrupt:
+        pass
+
+
+def _run_worker(config, bot_cls, worker_id):
+    async def worker():
+        client = CoordinatorClient(config['sharding']['socket_path'], worker_id)
+        await client.connect()
+
+        bot = bot_cls(config)
+        bot.risk_manager = CoordinatedRiskManager(config['risk_management'], client)
+        bot.market_filter = ShardedMarketFilter(config['filters'], client)
+        try:
+            await bot.run()
+        finally:
+            bot.stop()
+            await client.close()
+
+    try:
+        asyncio.run(worker())
+    except KeyboardInterrupt:
+        pass
+
+
+def run_sharded(config, bot_cls):
+    """Sobe o coordenador e N workers, cada um com um subconjunto dos símbolos"""
+    sharding = config['sharding']
+    print(f"🧩 Modo shard: {sharding['workers']} workers + coordenador")
+
+    coordinator = multiprocessing.Process(target=_run_coordinator, args=(config,), name='coordinator')
+    coordinator.start()
+
+    workers = [
+        multiprocessing.Process(target=_run_worker, args=(config, bot_cls, f'worker-{i}'), name=f'worker-{i}')
+        for i in range(sharding['workers'])
+    ]
+    for process in workers:
+        process.start()
+
+    try:
+        for process in workers:
+            process.join()
+    except KeyboardInterrupt:
+        print("\n🛑 Parando workers...")
+    finally:
+        for process in workers + [coordinator]:
+            if process.is_alive():
+                process.terminate()
+            process.join()
@@ -0,0 +1,6 @@
+# tests/conftest.py
+import os
+import sys
+
+# Módulos do bot ficam na raiz do repositório
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,160 @@
+# tests/test_cycle_recorder.py
+import asyncio
+import copy
+
+import numpy as np
+import pytest
+
+from cycle_recorder import CycleRecorder, CycleReplayer, read_recording, write_frame, write_header
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def write_recording(path, records):
+    with open(path, 'wb') as stream:
+        write_header(stream)
+        for record in records:
+            write_frame(stream, record)
+
+
+def record_cycles(path, config, cycles=3):
+    """Grava `cycles` ciclos do bot real com sinais de compra em todos os símbolos"""
+    from main import TradingBot
+
+    recorded = []
+
+    async def run():
+        bot = TradingBot(config)
+        clock = FakeClock()
+        bot.set_clock(clock)
+
+        async def slow_buy(market_data):
+            clock.now += 0.1  # análise leva tempo: leituras do relógio diferem dentro do ciclo
+            return await always_buy(market_data)
+
+        bot.strategy.analyze = slow_buy
+        with open(path, 'wb') as stream:
+            write_header(stream)
+
+            def sink(cycle):
+                recorded.append(cycle)
+                write_frame(stream, cycle)
+
+            CycleRecorder(sink).attach(bot)
+            for _ in range(cycles):
+                await bot.run_cycle()
+                clock.now += 31  # passa o cooldown e o cache de análise
+        bot.thread_pool.shutdown()
+
+    asyncio.run(run())
+    return recorded
+
+
+def replay(path, config):
+    from main import TradingBot
+
+    bot = TradingBot(config)
+    bot.strategy.analyze = always_buy
+    report = asyncio.run(CycleReplayer(bot, path).replay())
+    bot.thread_pool.shutdown()
+    return bot, report
+
+
+async def always_buy(market_data):
+    return {'action': 'buy', 'confidence': 0.8}
+
+
+@pytest.fixture
+def config(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)  # setup_logging grava o log no diretório atual
+    from main import CONFIG
+
+    return copy.deepcopy(CONFIG)
+
+
+def test_frames_round_trip(tmp_path):
+    path = tmp_path / 'run.bdr'
+    records = [
+        {'cycle': 1, 'clock': {'start': 1.0, 'fetch': 0.5, 'analysis': {'BTC/USDT': 0.1}, 'execution': {}},
+         'markets': [{'symbol': 'BTC/USDT', 'ohlcv': {'close': np.array([1.0, 2.0]),
+                                                      'date': np.array(['2024-01-01'], dtype='datetime64[ns]')}}]},
+        {'cycle': 2, 'markets': [{'ohlcv': {'close': np.array([], dtype=float)}}]},
+    ]
+    write_recording(path, records)
+
+    loaded = list(read_recording(path))
+
+    assert loaded[0]['clock'] == records[0]['clock']
+    ohlcv = loaded[0]['markets'][0]['ohlcv']
+    assert ohlcv['close'].tolist() == [1.0, 2.0]
+    assert ohlcv['date'].dtype == np.dtype('datetime64[ns]')
+    assert loaded[1]['markets'][0]['ohlcv']['close'].shape == (0,)
+
+
+def test_empty_file_is_rejected(tmp_path):
+    path = tmp_path / 'empty.bdr'
+    path.write_bytes(b'')
+
+    with pytest.raises(ValueError):
+        list(read_recording(path))
+
+
+def test_truncated_last_frame_ends_the_recording(tmp_path):
+    path = tmp_path / 'run.bdr'
+    write_recording(path, [{'cycle': 1}, {'cycle': 2}])
+    path.write_bytes(path.read_bytes()[:-3])
+
+    assert list(read_recording(path)) == [{'cycle': 1}]
+
+
+def test_behavior_change_is_reported_as_divergence(tmp_path, config):
+    path = tmp_path / 'run.bdr'
+    record_cycles(path, config)
+
+    _, unchanged = replay(path, config)
+    config['risk_management']['max_correlation'] = -1  # só um sinal por ciclo passa
+    _, changed = replay(path, config)
+
+    assert unchanged['cycles'] == 3
+    assert unchanged['divergences'] == []
+    assert changed['divergences']
+    assert {divergence['output'] for divergence in changed['divergences']} >= {'decisions', 'orders'}
+
+
+def test_replayed_orders_use_recorded_fill_prices(tmp_path, config):
+    path = tmp_path / 'run.bdr'
+    recorded = record_cycles(path, config)
+
+    bot, report = replay(path, config)
+
+    fills = [price for cycle in recorded for _, price in cycle['fills']]
+    assert report['orders'] == len(fills) > 0
+    assert [position['trade']['price'] for position in bot.risk_manager.open_positions] == fills
+
+
+def test_extra_clock_reads_do_not_shift_the_replay(tmp_path, config):
+    path = tmp_path / 'run.bdr'
+    record_cycles(path, config)
+
+    from main import TradingBot
+
+    bot = TradingBot(config)
+    bot.strategy.analyze = always_buy
+    replayer = CycleReplayer(bot, path)
+    analyze_market = bot.analyze_market
+
+    async def analyze_market_reading_the_clock(market):
+        bot.clock()  # leitura que não existia na gravação
+        return await analyze_market(market)
+
+    bot.analyze_market = analyze_market_reading_the_clock
+    report = asyncio.run(replayer.replay())
+    bot.thread_pool.shutdown()
+
+    assert report['divergences'] == []
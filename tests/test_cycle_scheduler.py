@@ -0,0 +1,109 @@
+# tests/test_cycle_scheduler.py
+import asyncio
+import copy
+
+import numpy as np
+import pandas as pd
+
+from cycle_recorder import CycleRecorder, CycleReplayer, write_frame, write_header
+from cycle_scheduler import CycleScheduler
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def market(symbol, volume=1e6):
+    closes = 100 * np.exp(np.cumsum(np.random.default_rng(0).normal(0, 0.01, 30)))
+    return {'symbol': symbol, 'volume_24h': volume, 'ohlcv': pd.DataFrame({'close': closes})}
+
+
+def test_deadline_is_capped_by_staleness():
+    scheduler = CycleScheduler({'cycle_deadline': 2.5, 'max_staleness': 2.0}, scan_interval=3)
+
+    assert scheduler.deadline == 2.0
+
+
+def test_open_positions_and_volume_go_first():
+    scheduler = CycleScheduler({}, scan_interval=3)
+    markets = [market('A/USDT', 1e5), market('B/USDT', 1e7), market('C/USDT', 1e5)]
+
+    ordered = scheduler.prioritize(markets, open_symbols={'C/USDT'})
+
+    assert [m['symbol'] for m in ordered] == ['C/USDT', 'B/USDT', 'A/USDT']
+
+
+def test_symbols_that_do_not_fit_are_shed():
+    clock = FakeClock()
+    scheduler = CycleScheduler({'cycle_deadline': 1.0}, scan_interval=3)
+    markets = [market(f'S{i}/USDT', volume=1e6 * (10 - i)) for i in range(5)]
+
+    async def analyze(m):
+        clock.now += 0.4
+        return {'action': 'hold', 'confidence': 0}
+
+    analyzed, shed = asyncio.run(scheduler.analyze(markets, analyze, set(), clock, clock()))
+
+    assert [m['symbol'] for m, _ in analyzed] == ['S0/USDT', 'S1/USDT']
+    assert shed == 3
+    assert scheduler.shed_total == 3
+
+
+def test_stale_market_is_detected():
+    scheduler = CycleScheduler({'max_staleness': 2.0}, scan_interval=3)
+
+    assert scheduler.is_stale({'fetched_at': 100.0}, 102.5)
+    assert not scheduler.is_stale({'fetched_at': 100.0}, 101.0)
+
+
+def test_replay_reproduces_shedding_under_load(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)  # setup_logging grava o log no diretório atual
+    from main import CONFIG, TradingBot
+
+    config = copy.deepcopy(CONFIG)
+    config['scheduler']['cycle_deadline'] = 0.5
+    path = tmp_path / 'run.bdr'
+    recorded = []
+
+    async def hold(market_data):
+        return {'action': 'hold', 'confidence': 0}
+
+    async def record():
+        bot = TradingBot(config)
+        clock = FakeClock()
+        bot.set_clock(clock)
+
+        async def analyze(market_data):
+            clock.now += 0.2  # análise lenta: nem todos os símbolos cabem no deadline
+            return await hold(market_data)
+
+        bot.strategy.analyze = analyze
+        with open(path, 'wb') as stream:
+            write_header(stream)
+
+            def sink(cycle):
+                recorded.append(cycle)
+                write_frame(stream, cycle)
+
+            CycleRecorder(sink).attach(bot)
+            for _ in range(3):
+                await bot.run_cycle()
+                clock.now += 5  # expira o cache de análise
+        bot.thread_pool.shutdown()
+
+    asyncio.run(record())
+
+    analyzed = [decision[1] for decision in recorded[0]['decisions'] if decision[0] == 'analyzed']
+    assert 0 < len(analyzed[0]) < 5
+
+    bot = TradingBot(config)
+    bot.strategy.analyze = hold
+    report = asyncio.run(CycleReplayer(bot, path).replay())
+    bot.thread_pool.shutdown()
+
+    assert report['cycles'] == 3
+    assert report['divergences'] == []
@@ -0,0 +1,121 @@
+# tests/test_portfolio_risk.py
+import asyncio
+
+import numpy as np
+import pandas as pd
+
+from portfolio_risk import PortfolioRiskEvaluator
+from risk_manager import RiskManager
+
+RISK_CONFIG = {'max_daily_trades': 20, 'max_position_size': 500, 'daily_loss_limit': -300,
+               'max_correlation': 0.8}
+
+
+def candidate(symbol, confidence, returns, action='buy'):
+    closes = 100 * np.exp(np.cumsum(np.concatenate(([0.0], returns))))
+    market = {'symbol': symbol, 'ohlcv': pd.DataFrame({'close': closes})}
+    return market, {'action': action, 'confidence': confidence}
+
+
+def allocated(allocations):
+    return [market['symbol'] for market, _, _ in allocations]
+
+
+def test_budget_goes_to_best_signals_not_arrival_order():
+    rng = np.random.default_rng(1)
+    candidates = [candidate(f'S{i}/USDT', conf, rng.normal(0, 0.01, 30))
+                  for i, conf in enumerate([0.56, 0.60, 0.85, 0.70, 0.80])]
+
+    allocations = PortfolioRiskEvaluator(RISK_CONFIG).evaluate(candidates, RiskManager(RISK_CONFIG), 2, {})
+
+    assert allocated(allocations) == ['S2/USDT', 'S4/USDT']
+
+
+def test_dropped_candidates_do_not_block_lower_ranked_ones():
+    rng = np.random.default_rng(0)
+    x, y = rng.normal(0, 0.01, 30), rng.normal(0, 0.01, 30)
+    x -= x.mean()
+    y -= y.mean()
+    y -= (y @ x) / (x @ x) * x  # y ortogonal a x: corr(A, C) = 0
+    y *= np.linalg.norm(x) / np.linalg.norm(y)
+    candidates = [
+        candidate('A/USDT', 0.85, x),
+        candidate('B/USDT', 0.80, x + y),  # corr ~0.7 com A e com C
+        candidate('C/USDT', 0.75, y),
+    ]
+
+    allocations = PortfolioRiskEvaluator({**RISK_CONFIG, 'max_correlation': 0.6, 'correlation_window': 60}).evaluate(
+        candidates, RiskManager(RISK_CONFIG), 20, {})
+
+    assert allocated(allocations) == ['A/USDT', 'C/USDT']
+
+
+def test_opposite_sides_on_correlated_assets_are_a_hedge():
+    rng = np.random.default_rng(2)
+    x = rng.normal(0, 0.01, 30)
+    candidates = [candidate('A/USDT', 0.85, x), candidate('B/USDT', 0.80, x, action='sell')]
+
+    allocations = PortfolioRiskEvaluator(RISK_CONFIG).evaluate(candidates, RiskManager(RISK_CONFIG), 20, {})
+
+    assert allocated(allocations) == ['A/USDT', 'B/USDT']
+
+
+def test_pairs_in_cooldown_do_not_take_budget():
+    rng = np.random.default_rng(3)
+    candidates = [candidate('A/USDT', 0.85, rng.normal(0, 0.01, 30)),
+                  candidate('B/USDT', 0.60, rng.normal(0, 0.01, 30))]
+    risk_manager = RiskManager(RISK_CONFIG)
+    risk_manager.last_trade_time['A/USDT'] = risk_manager.now()
+
+    allocations = PortfolioRiskEvaluator(RISK_CONFIG).evaluate(candidates, risk_manager, 1, {})
+
+    assert allocated(allocations) == ['B/USDT']
+
+
+def test_remaining_trades_resets_on_a_new_day():
+    risk_manager = RiskManager(RISK_CONFIG)
+    risk_manager.daily_trades = 20
+    assert asyncio.run(risk_manager.remaining_trades()) == 0
+
+    now = risk_manager.clock()
+    risk_manager.clock = lambda: now + 2 * 86400
+
+    assert asyncio.run(risk_manager.remaining_trades()) == 20
+
+
+def test_fills_from_previous_days_do_not_starve_sizing():
+    rng = np.random.default_rng(4)
+    candidates = [candidate('A/USDT', 0.85, rng.normal(0, 0.01, 30))]
+    risk_manager = RiskManager(RISK_CONFIG)
+    start = risk_manager.clock()
+
+    # Vários dias de compras em A, nenhuma saída de posição
+    for day in range(5):
+        risk_manager.clock = lambda: start + day * 86400
+        for _ in range(10):
+            risk_manager._set_quick_stops({'current_price': 100.0}, {'action': 'buy'},
+                                          {'symbol': 'A/USDT', 'side': 'buy', 'amount': 52.0})
+
+    exposure = asyncio.run(risk_manager.portfolio_exposure())
+    allocations = PortfolioRiskEvaluator(RISK_CONFIG).evaluate(candidates, risk_manager, 20, exposure)
+
+    assert exposure == {'A': 520.0}  # só as do dia corrente
+    assert allocations[0][2] == 52.0 / (1 + 520.0 / 500)
+
+    risk_manager.clock = lambda: start + 5 * 86400
+    exposure = asyncio.run(risk_manager.portfolio_exposure())
+    allocations = PortfolioRiskEvaluator(RISK_CONFIG).evaluate(candidates, risk_manager, 20, exposure)
+
+    assert allocations[0][2] == 52.0
+
+
+def test_cycle_exposure_is_unbounded_unless_configured():
+    rng = np.random.default_rng(5)
+    candidates = [candidate(f'S{i}/USDT', 0.85, rng.normal(0, 0.01, 30)) for i in range(3)]
+
+    unbounded = PortfolioRiskEvaluator(RISK_CONFIG).evaluate(candidates, RiskManager(RISK_CONFIG), 20, {})
+    bounded = PortfolioRiskEvaluator({**RISK_CONFIG, 'max_cycle_exposure': 100}).evaluate(
+        candidates, RiskManager(RISK_CONFIG), 20, {})
+
+    assert [size for _, _, size in unbounded] == [52.0] * 3
+    assert [size for _, _, size in bounded] == [52.0, 48.0]
@@ -0,0 +1,178 @@
+# tests/test_shard_coordinator.py
+import asyncio
+import time
+
+from shard_coordinator import CoordinatedRiskManager, RiskCoordinator
+
+RISK_CONFIG = {'max_daily_trades': 3, 'max_position_size': 100, 'daily_loss_limit': -300}
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = time.time()
+
+    def __call__(self):
+        return self.now
+
+
+def make_coordinator(**overrides):
+    coordinator = RiskCoordinator({**RISK_CONFIG, **overrides}, ['BTC/USDT', 'ETH/USDT'], '/tmp/unused.sock')
+    coordinator.clock = FakeClock()
+    coordinator.handle({'op': 'register', 'worker_id': 'w0'}, 'w0')
+    return coordinator
+
+
+def reserve(coordinator, symbol='BTC/USDT', amount=40, worker_id='w0'):
+    return coordinator.handle({'op': 'reserve', 'symbol': symbol, 'amount': amount}, worker_id)
+
+
+def commit(coordinator, reservation, filled=True, symbol='BTC/USDT', worker_id='w0'):
+    return coordinator.handle({'op': 'commit', 'reservation_id': reservation['id'], 'filled': filled,
+                               'symbol': symbol, 'amount': reservation['amount']}, worker_id)
+
+
+def test_daily_trade_limit_counts_in_flight_reservations():
+    coordinator = make_coordinator(max_position_size=1000)
+
+    granted = [reserve(coordinator) for _ in range(4)]
+
+    assert [r['granted'] for r in granted] == [True, True, True, False]
+
+
+def test_unfilled_commit_releases_the_slot():
+    coordinator = make_coordinator(max_daily_trades=1)
+
+    first = reserve(coordinator)
+    commit(coordinator, first, filled=False)
+
+    assert reserve(coordinator)['granted']
+    assert coordinator.daily_trades == 0
+
+
+def test_filled_commit_with_unknown_id_still_counts():
+    coordinator = make_coordinator(max_daily_trades=1)
+
+    response = coordinator.handle({'op': 'commit', 'reservation_id': 999, 'filled': True,
+                                   'symbol': 'BTC/USDT', 'amount': 40}, 'w0')
+
+    assert not response['ok']
+    assert coordinator.daily_trades == 1
+    assert coordinator.exposure['BTC'] == 40
+    assert not reserve(coordinator)['granted']
+
+
+def test_slow_fill_never_frees_its_slot():
+    coordinator = make_coordinator(max_daily_trades=1)
+    coordinator.handle({'op': 'register', 'worker_id': 'w1'}, 'w1')
+
+    slow = reserve(coordinator)
+    assert not reserve(coordinator, symbol='ETH/USDT', worker_id='w1')['granted']
+
+    commit(coordinator, slow)
+    assert coordinator.daily_trades == 1
+
+
+def test_position_cap_is_per_order_and_in_flight():
+    coordinator = make_coordinator(max_daily_trades=20)
+
+    assert reserve(coordinator, amount=250)['amount'] == 100
+    assert not reserve(coordinator, amount=40)['granted']
+
+
+def test_fills_over_many_days_do_not_block_a_symbol():
+    coordinator = make_coordinator(max_daily_trades=20)
+
+    for _ in range(30):
+        reservation = reserve(coordinator, amount=40)
+        assert reservation['granted']
+        commit(coordinator, reservation)
+        coordinator.clock.now += 86400
+
+    assert coordinator.exposure == {'BTC': 40}
+
+
+def test_cooldown_survives_rebalancing():
+    coordinator = make_coordinator(max_daily_trades=20)
+    commit(coordinator, reserve(coordinator))
+
+    # BTC/USDT passa para outro worker: o cooldown continua valendo no coordenador
+    coordinator._remove_worker('w0')
+    coordinator.handle({'op': 'register', 'worker_id': 'w1'}, 'w1')
+    assert not reserve(coordinator, worker_id='w1')['granted']
+
+    coordinator.clock.now += 31
+    assert reserve(coordinator, worker_id='w1')['granted']
+
+
+def test_close_releases_exposure_and_feeds_loss_limit():
+    coordinator = make_coordinator(max_daily_trades=20)
+    commit(coordinator, reserve(coordinator, amount=100))
+    coordinator.clock.now += 31
+
+    coordinator.handle({'op': 'close', 'symbol': 'BTC/USDT', 'amount': 100, 'pnl': -300}, 'w0')
+
+    assert coordinator.exposure['BTC'] == 0
+    assert not reserve(coordinator)['granted']
+
+
+def test_worker_leaving_counts_pending_reservations_as_filled():
+    coordinator = make_coordinator()
+    reserve(coordinator)
+
+    coordinator._remove_worker('w0')
+
+    assert coordinator.reservations == {}
+    assert coordinator.daily_trades == 1
+    assert coordinator.exposure['BTC'] == 40
+
+
+def test_reserve_rejects_symbols_owned_by_another_worker():
+    coordinator = make_coordinator()
+    coordinator.handle({'op': 'register', 'worker_id': 'w1'}, 'w1')
+
+    owned = coordinator.handle({'op': 'assignment'}, 'w1')['symbols']
+    other = next(symbol for symbol in coordinator.symbols if symbol not in owned)
+
+    assert not reserve(coordinator, symbol=other, worker_id='w1')['granted']
+
+
+class FailingClient:
+    worker_id = 'w0'
+
+    async def request(self, op, **payload):
+        if op == 'reserve':
+            return {'granted': True, 'id': 1, 'amount': payload['amount']}
+        raise ConnectionError("coordenador caiu")
+
+
+class FilledTrader:
+    async def place_market_order(self, symbol, side, amount):
+        return {'symbol': symbol, 'side': side, 'amount': amount, 'price': 100.0}
+
+
+def test_filled_order_is_kept_locally_when_commit_fails():
+    risk_manager = CoordinatedRiskManager({**RISK_CONFIG, 'quick_mode': True}, FailingClient())
+    market = {'symbol': 'BTC/USDT', 'current_price': 100.0}
+
+    trade = asyncio.run(risk_manager.execute_trade(market, {'action': 'buy', 'confidence': 0.8}, FilledTrader()))
+
+    assert trade is not None
+    assert risk_manager.daily_trades == 1
+    assert 'BTC/USDT' in risk_manager.last_trade_time
+    assert len(risk_manager.open_positions) == 1
+
+
+def test_status_reports_net_exposure_across_workers():
+    coordinator = make_coordinator(max_daily_trades=20)
+    coordinator.handle({'op': 'register', 'worker_id': 'w1'}, 'w1')
+    owner = {symbol: worker for worker, symbols in coordinator.workers.items() for symbol in symbols}
+
+    commit(coordinator, reserve(coordinator, 'BTC/USDT', worker_id=owner['BTC/USDT']),
+           worker_id=owner['BTC/USDT'])
+    sell = coordinator.handle({'op': 'reserve', 'symbol': 'ETH/USDT', 'amount': 30, 'side': 'sell'},
+                              owner['ETH/USDT'])
+    commit(coordinator, sell, symbol='ETH/USDT', worker_id=owner['ETH/USDT'])
+
+    status = coordinator.handle({'op': 'status'}, 'w0')
+
+    assert status['exposure'] == {'BTC': 40, 'ETH': -30}
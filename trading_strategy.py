@@ -1,4 +1,5 @@
 # trading_strategy.py
+import zlib
 import pandas as pd
 import numpy as np
 from technical_indicators import calculate_rsi_fast, calculate_ema_fast
@@ -96,7 +97,8 @@ class TradingStrategy:
                 momentum_condition = -1
 
         # 4. Variação baseada no ciclo para evitar repetição
-        cycle_variation = (self.cycle_count + hash(symbol) % 10) % 3 - 1
+        # crc32 em vez de hash(): estável entre processos (PYTHONHASHSEED), necessário para o replay
+        cycle_variation = (self.cycle_count + zlib.crc32(symbol.encode()) % 10) % 3 - 1
 
         # Sinal combinado
         total_score = rsi_condition + ema_condition + momentum_condition + cycle_variation